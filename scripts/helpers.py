@@ -3,9 +3,19 @@
 Helper functions for version updating
 """
 
+import functools
 import re
 from typing import Tuple
 
+_HEAD_READ_SIZE = 16384
+
+_VERSION_HEADER_RE = re.compile(r"Version:\s+([0-9]+\.[0-9]+\.[0-9]+)")
+# Header and define() forms in one pass; group 1 is the header, group 2 the define
+_VERSION_ANY_RE = re.compile(
+    r"Version:\s+([0-9]+\.[0-9]+\.[0-9]+)"
+    r"|define\(\s*'[\w_]+VERSION',\s*'([0-9]+\.[0-9]+\.[0-9]+)'\s*\)"
+)
+
 def get_current_version(php_file_path: str) -> str:
     """
     Extract the current version from a PHP file.
@@ -20,17 +30,28 @@ def get_current_version(php_file_path: str) -> str:
         ValueError: If the version cannot be extracted
     """
     with open(php_file_path, "r") as f:
-        content = f.read()
-    
-    # Look for version in header comment
-    version_match = re.search(r"Version:\s+([0-9]+\.[0-9]+\.[0-9]+)", content)
-    if version_match:
-        return version_match.group(1)
+        # The plugin header lives at the top of the file, so try a bounded
+        # read first and only read the rest of the file on a miss
+        content = f.read(_HEAD_READ_SIZE)
+        match = _VERSION_ANY_RE.search(content)
+        # A match ending at the buffer edge may have a truncated patch number
+        if match and match.group(1) and match.end() < len(content):
+            return match.group(1)
+        
+        if len(content) == _HEAD_READ_SIZE:
+            content += f.read()
     
-    # Alternatively, look for version in define statement
-    define_match = re.search(r"define\(\s*'[\w_]+VERSION',\s*'([0-9]+\.[0-9]+\.[0-9]+)'\s*\)", content)
-    if define_match:
-        return define_match.group(1)
+    match = _VERSION_ANY_RE.search(content)
+    if match:
+        # Version in header comment
+        if match.group(1):
+            return match.group(1)
+        
+        # A header further down still takes precedence over the define statement
+        header_match = _VERSION_HEADER_RE.search(content, match.end())
+        if header_match:
+            return header_match.group(1)
+        return match.group(2)
     
     raise ValueError(f"Could not extract version from {php_file_path}")
 
@@ -44,9 +65,10 @@ def increment_version(version: str) -> str:
     Returns:
         New version string with patch version incremented (e.g., "1.0.3")
     """
-    major, minor, patch = map(int, version.split("."))
+    major, minor, patch = parse_version(version)
     return f"{major}.{minor}.{patch + 1}"
 
+@functools.lru_cache(maxsize=128)
 def parse_version(version: str) -> Tuple[int, int, int]:
     """
     Parse a version string into its components.
@@ -57,8 +79,9 @@ def parse_version(version: str) -> Tuple[int, int, int]:
     Returns:
         Tuple of (major, minor, patch) as integers
     """
-    parts = version.split(".")
-    if len(parts) != 3:
+    major, _, rest = version.partition(".")
+    minor, _, patch = rest.partition(".")
+    if not major or not minor or not patch or "." in patch:
         raise ValueError(f"Invalid version format: {version}")
     
-    return tuple(map(int, parts)) 
+    return (int(major), int(minor), int(patch))
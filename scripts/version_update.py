@@ -9,9 +9,86 @@ based on PR information.
 import os
 import re
 import sys
-import yaml
 import datetime
-from helpers import get_current_version, increment_version
+import functools
+import io
+import itertools
+import stat
+import tempfile
+from collections import namedtuple
+from helpers import get_current_version, increment_version, parse_version
+
+_RELEASE_TAG = "[release]"
+# The changelog header is expected near the top of the file
+_HEADER_SCAN_LIMIT = 65536
+_WRITE_BUFFER_SIZE = 1 << 20
+_VERSION_LINE_RE = re.compile(r"^(\d+\.\d+\.\d+) \(\d{4}-\d{2}-\d{2}\)")
+
+# A search/replace pattern from the config, prepared once at load time
+# replace_parts is the replace template split around {{new_version}}
+VersionPattern = namedtuple("VersionPattern", "search search_re replace_parts is_literal")
+
+@functools.lru_cache(maxsize=256)
+def _compiled(pattern):
+    """
+    Compile a config-supplied regex once per process
+    
+    Args:
+        pattern: Regular expression string from the config
+        
+    Returns:
+        Compiled regular expression
+    """
+    return re.compile(pattern)
+
+def _write_atomically(file_path, chunks):
+    """
+    Write content to a file via a temporary file and an atomic rename, so the
+    file is never left truncated if the process dies mid-write
+    
+    Args:
+        file_path: Path to the file to write
+        chunks: Iterable of strings making up the new content
+    """
+    tmp_name = None
+    try:
+        # A 1 MiB buffer turns the many small line writes into a single write()
+        with tempfile.NamedTemporaryFile(
+            "w", buffering=_WRITE_BUFFER_SIZE, delete=False, dir=os.path.dirname(file_path) or "."
+        ) as tmp:
+            tmp_name = tmp.name
+            tmp.writelines(chunks)
+            # One fsync per file, so the rename never exposes unflushed data
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        
+        # NamedTemporaryFile creates the file as 0600, keep the original mode
+        os.chmod(tmp_name, stat.S_IMODE(os.stat(file_path).st_mode))
+        os.replace(tmp_name, file_path)
+    except BaseException:
+        if tmp_name is not None:
+            os.unlink(tmp_name)
+        raise
+
+def _make_pattern(pattern):
+    """
+    Prepare a search/replace pattern from the config
+    
+    Args:
+        pattern: Dict with "search" and "replace" keys
+        
+    Returns:
+        VersionPattern, or None if the search or replace is missing
+    """
+    search = pattern.get("search")
+    replace_template = pattern.get("replace")
+    if not (search and replace_template):
+        return None
+    
+    # Literal patterns with plain replacements can skip the regex engine
+    is_literal = re.escape(search) == search and "\\" not in replace_template
+    replace_parts = tuple(replace_template.split("{{new_version}}"))
+    return VersionPattern(search, _compiled(search), replace_parts, is_literal)
 
 def load_config(config_path="version-update-config.yml"):
     """
@@ -24,12 +101,61 @@ def load_config(config_path="version-update-config.yml"):
         Dict with configuration
     """
     try:
+        # Imported here so non-release PRs exit without loading PyYAML
+        import yaml
+        
+        # Prefer the libyaml-backed loader when PyYAML was built with it
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
         with open(config_path, "r") as f:
-            return yaml.safe_load(f)
+            config = yaml.load(f, Loader=loader)
+        
+        # Compile every configured regex once, up front
+        for file_config in (config or {}).get("files", []):
+            if "patterns" in file_config:
+                # An empty patterns key loads as None; skip entries that are not mappings
+                patterns = (_make_pattern(pattern) for pattern in file_config.get("patterns") or []
+                            if isinstance(pattern, dict))
+                file_config["patterns"] = [pattern for pattern in patterns if pattern is not None]
+            # Validate header patterns now rather than on the first changelog
+            if file_config.get("header_pattern"):
+                _compiled(file_config["header_pattern"])
+        
+        return config
     except Exception as e:
         print(f"Error loading config: {str(e)}")
         sys.exit(1)
 
+def _apply_version_patterns(content, patterns, new_version):
+    """
+    Apply version search/replace patterns to file content
+    
+    Args:
+        content: Current file content
+        patterns: List of search/replace patterns, as config dicts or VersionPattern
+        new_version: New version string to use in replacements
+        
+    Returns:
+        Tuple of (updated file content, number of matches replaced)
+    """
+    total = 0
+    for pattern in patterns:
+        if not isinstance(pattern, VersionPattern):
+            if not isinstance(pattern, dict):
+                continue
+            pattern = _make_pattern(pattern)
+            if pattern is None:
+                continue
+        
+        replace = new_version.join(pattern.replace_parts)
+        if pattern.is_literal:
+            count = content.count(pattern.search)
+            if count:
+                content = content.replace(pattern.search, replace)
+        else:
+            content, count = pattern.search_re.subn(replace, content)
+        total += count
+    return content, total
+
 def update_version_in_file(file_path, patterns, new_version):
     """
     Update version in a file using the provided patterns
@@ -39,159 +165,251 @@ def update_version_in_file(file_path, patterns, new_version):
         patterns: List of search/replace patterns
         new_version: New version string to use in replacements
     """
-    try:
-        with open(file_path, "r") as f:
-            content = f.read()
-            
-        for pattern in patterns:
-            search = pattern.get("search")
-            replace_template = pattern.get("replace")
-            
-            if search and replace_template:
-                replace = replace_template.replace("{{new_version}}", new_version)
-                content = re.sub(search, replace, content)
-        
-        with open(file_path, "w") as f:
-            f.write(content)
-            
-        print(f"Updated version in {file_path} to {new_version}")
-    except Exception as e:
-        print(f"Error updating version in {file_path}: {str(e)}")
-        return False
-    
-    return True
+    return _update_file(file_path, [{"type": "php", "patterns": patterns}], new_version)
 
-def update_changelog(file_path, header_pattern, changelog_entry, new_version):
+def _insert_after_highest(lines, header_line_index, versions, new_version):
     """
-    Update changelog file with a new entry AFTER the highest version
+    Find where a new changelog entry goes: after the highest version's entry,
+    or right after the header when there are no entries yet
     
     Args:
-        file_path: Path to the changelog file
-        header_pattern: Regular expression to find where to insert the new entry
-        changelog_entry: The new changelog entry text
+        lines: Lines of the changelog file
+        header_line_index: Index of the last header line
+        versions: Version entries as [(line_number, version, parsed_version), ...]
         new_version: New version string
-    """
-    try:
-        # Read file contents as lines
-        with open(file_path, "r") as f:
-            lines = f.readlines()
         
-        # Get current date
-        today = datetime.datetime.now().strftime("%Y-%m-%d")
+    Returns:
+        Line index to insert the new entry at
+    """
+    if not versions:
+        # No version entries found, insert right after the header
+        insertion_index = header_line_index + 1
+        # Skip empty lines
+        while insertion_index < len(lines) and not lines[insertion_index].strip():
+            insertion_index += 1
+        print(f"No version entries found, inserting after header at line {insertion_index}")
+    else:
+        # Find the highest version by its numeric value (semver)
+        highest_version_line, highest_version, _ = max(versions, key=lambda x: x[2])
+        print(f"Highest version found: {highest_version} at line {highest_version_line}")
         
-        # Create new entry
-        new_entry_lines = [f"{new_version} ({today})\n"]
-        for line in changelog_entry.strip().split('\n'):
-            new_entry_lines.append(f"{line}\n")
-        new_entry_lines.append("\n")  # Add extra newline for spacing
+        # Find where this version's entry ends (look for next version or EOF)
+        # Start searching from the line after the version line
+        end_of_entry = highest_version_line + 1
+        while end_of_entry < len(lines):
+            # If we hit another version entry, we've found the end
+            if _VERSION_LINE_RE.match(lines[end_of_entry]):
+                break
+            # If we're at the end of the file, we've found the end
+            end_of_entry += 1
         
-        # Process the file
-        header_found = False
-        header_line_index = -1
-        version_pattern = re.compile(r"^(\d+\.\d+\.\d+) \(\d{4}-\d{2}-\d{2}\)")
-        versions = []  # List to store all version entries [(line_number, version), ...]
+        # Insert after the highest version's entry
+        insertion_index = end_of_entry
+        print(f"Inserting new version {new_version} after version {highest_version} at line {insertion_index}")
+    
+    return insertion_index
+
+def _insert_changelog_entry(file_path, lines, header_pattern, changelog_entry, new_version, today=None):
+    """
+    Add a new entry to changelog lines AFTER the highest version
+    
+    Args:
+        file_path: Path to the changelog file, used in log messages
+        lines: Lines of the changelog file
+        header_pattern: Regular expression to find where to insert the new entry
+        changelog_entry: The new changelog entry text
+        new_version: New version string
+        today: Release date in YYYY-MM-DD format, defaults to the current date
         
-        # First pass: Find the header
-        for i, line in enumerate(lines):
+    Returns:
+        Updated lines, or None if the header could not be found
+    """
+    header_re = _compiled(header_pattern)
+    
+    # Get current date
+    if today is None:
+        today = datetime.date.today().isoformat()
+    
+    # Create new entry
+    new_entry_lines = [f"{new_version} ({today})\n"]
+    for line in changelog_entry.strip().split('\n'):
+        new_entry_lines.append(f"{line}\n")
+    new_entry_lines.append("\n")  # Add extra newline for spacing
+    
+    # Process the file
+    header_found = False
+    header_line_index = -1
+    versions = []  # List to store all version entries [(line_number, version, parsed_version), ...]
+    
+    # Single pass: find the header, then collect every version entry after it
+    scanned = 0
+    for i, line in enumerate(lines):
+        if not header_found:
+            scanned += len(line)
+            if scanned > _HEADER_SCAN_LIMIT:
+                break
             # Only check if we have at least 2 lines
             if i < len(lines) - 1:
-                two_line_content = lines[i] + lines[i+1]
-                if re.search(header_pattern, two_line_content):
+                two_line_content = line + lines[i+1]
+                if header_re.search(two_line_content):
                     header_found = True
                     header_line_index = i+1  # Set to the line after "========="
                     print(f"Header found at lines {i} and {i+1}")
-                    break
-                
-        if not header_found:
-            print(f"Could not find header pattern in {file_path}")
-            return False
-        
-        # Second pass: Find all version entries
-        print(f"Looking for all version entries after line {header_line_index}")
-        for i in range(header_line_index + 1, len(lines)):
-            match = version_pattern.match(lines[i])
+                    print(f"Looking for all version entries after line {header_line_index}")
+        elif i > header_line_index:
+            match = _VERSION_LINE_RE.match(line)
             if match:
                 version = match.group(1)
-                versions.append((i, version))
+                versions.append((i, version, parse_version(version)))
                 print(f"Found version entry at line {i}: {version}")
-        
-        if not versions:
-            # No version entries found, insert right after the header
-            insertion_index = header_line_index + 1
-            # Skip empty lines
-            while insertion_index < len(lines) and not lines[insertion_index].strip():
-                insertion_index += 1
-            print(f"No version entries found, inserting after header at line {insertion_index}")
-        else:
-            # Find the highest version - first sort by version number (semver)
-            from helpers import parse_version
-            
-            # Sort versions by their numeric value (descending)
-            sorted_versions = sorted(versions, key=lambda x: parse_version(x[1]), reverse=True)
-            highest_version_line, highest_version = sorted_versions[0]
-            print(f"Highest version found: {highest_version} at line {highest_version_line}")
-            
-            # Find where this version's entry ends (look for next version or EOF)
-            # Start searching from the line after the version line
-            end_of_entry = highest_version_line + 1
-            while end_of_entry < len(lines):
-                # If we hit another version entry, we've found the end
-                if version_pattern.match(lines[end_of_entry]):
-                    break
-                # If we're at the end of the file, we've found the end
-                end_of_entry += 1
-            
-            # Insert after the highest version's entry
-            insertion_index = end_of_entry
-            print(f"Inserting new version {new_version} after version {highest_version} at line {insertion_index}")
-        
-        # Insert the new entry
-        updated_lines = lines[:insertion_index] + new_entry_lines + lines[insertion_index:]
-        
-        # Write the updated content back to the file
-        with open(file_path, "w") as f:
-            f.writelines(updated_lines)
-        
-        print(f"Updated changelog in {file_path}")
-        return True
     
+    if not header_found:
+        print(f"Could not find header pattern in {file_path}")
+        return None
+    
+    insertion_index = _insert_after_highest(lines, header_line_index, versions, new_version)
+    
+    return itertools.chain(lines[:insertion_index], new_entry_lines, lines[insertion_index:])
+
+def update_changelog(file_path, header_pattern, changelog_entry, new_version, today=None):
+    """
+    Update changelog file with a new entry AFTER the highest version
+    
+    Args:
+        file_path: Path to the changelog file
+        header_pattern: Regular expression to find where to insert the new entry
+        changelog_entry: The new changelog entry text
+        new_version: New version string
+        today: Release date in YYYY-MM-DD format, defaults to the current date
+    """
+    file_config = {"type": "changelog", "header_pattern": header_pattern}
+    return _update_file(file_path, [file_config], new_version, changelog_entry, today)
+
+def _update_file(file_path, file_configs, new_version, changelog_entry=None, today=None):
+    """
+    Apply every configured update for one file with a single read, writing
+    the result back only if the content actually changed
+    
+    Args:
+        file_path: Path to the file to update
+        file_configs: Config entries for this path, applied in order
+        new_version: New version string
+        changelog_entry: The new changelog entry text, for changelog entries
+        today: Release date in YYYY-MM-DD format, defaults to the current date
+        
+    Returns:
+        True if every update succeeded, False otherwise
+    """
+    try:
+        with open(file_path, "r") as f:
+            content = f.read()
+        
+        lines = None  # Set instead of content once a changelog entry is inserted
+        changed = False
+        success = True
+        messages = []
+        for file_config in file_configs:
+            if file_config.get("type") == "php":
+                if lines is not None:
+                    content = "".join(lines)
+                    lines = None
+                updated_content, matches = _apply_version_patterns(
+                    content, file_config.get("patterns") or [], new_version
+                )
+                # Only compare contents when something matched; a match can
+                # still replace a version with the same value on a re-run
+                if matches and updated_content != content:
+                    changed = True
+                    messages.append(f"Updated version in {file_path} to {new_version}")
+                content = updated_content
+            else:
+                # A previous changelog insert left a chain, which cannot be indexed
+                lines = io.StringIO(content).readlines() if lines is None else list(lines)
+                header_pattern = file_config.get("header_pattern", "")
+                updated_lines = _insert_changelog_entry(
+                    file_path, lines, header_pattern, changelog_entry, new_version, today
+                )
+                if updated_lines is None:
+                    success = False
+                    continue
+                lines = updated_lines
+                changed = True
+                messages.append(f"Updated changelog in {file_path}")
+        
+        if not changed:
+            if success:
+                print(f"No change in {file_path}")
+            return success
+        
+        _write_atomically(file_path, [content] if lines is None else lines)
+        
+        for message in messages:
+            print(message)
     except Exception as e:
-        print(f"Error updating changelog in {file_path}: {str(e)}")
+        print(f"Error updating {file_path}: {str(e)}")
         return False
+    
+    return success
+
+def _read_optional(file_path):
+    """
+    Read a file that may not exist
+    
+    Args:
+        file_path: Path to the file to read
+        
+    Returns:
+        The file contents, or an empty string if the file does not exist
+    """
+    try:
+        with open(file_path, "r") as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
 
 def main():
+    # Check if this is a release PR - case-insensitive check
+    # Done before loading the config so non-release PRs exit without any file I/O
+    pr_title = os.environ.get("PR_TITLE", "")
+    if pr_title[:len(_RELEASE_TAG)].lower() != _RELEASE_TAG:
+        print(f"Not a release PR ('{pr_title}'), skipping version update")
+        sys.exit(0)
+    
+    # Title without the [release] tag, used for the fallback changelog entry
+    clean_title = pr_title[len(_RELEASE_TAG):].strip()
+    
     # Load configuration
     config = load_config()
     if not config:
         print("Could not load configuration")
         sys.exit(1)
     
-    # Check if this is a release PR - case-insensitive check
-    pr_title = os.environ.get("PR_TITLE", "")
-    if not re.search(r'^\[release\]', pr_title, re.IGNORECASE):
-        print(f"Not a release PR ('{pr_title}'), skipping version update")
-        sys.exit(0)
-    
     # Get PR information
-    pr_description = ""
-    pr_changes = ""
-    
-    if os.path.exists("pr_description.txt"):
-        with open("pr_description.txt", "r") as f:
-            pr_description = f.read()
-            
-    if os.path.exists("pr_changes.txt"):
-        with open("pr_changes.txt", "r") as f:
-            pr_changes = f.read()
-            print(f"Found checklist items/changes: {pr_changes}")
-    
-    # Find main PHP file to get current version
-    main_php_file = None
+    pr_description = _read_optional("pr_description.txt")
+    pr_changes = _read_optional("pr_changes.txt")
+    if pr_changes:
+        print(f"Found checklist items/changes: {pr_changes}")
+    
+    # Group configured updates by path in a single pass, so each file is read
+    # and written at most once even when several entries target it
+    php_files = []
+    files_by_path = {}
     for file_config in config.get("files", []):
-        if file_config.get("type") == "php":
-            main_php_file = file_config.get("path")
-            break
+        file_path = file_config.get("path")
+        file_type = file_config.get("type")
+        needs_description = file_config.get("needs_description", True)  # Default to True for backwards compatibility
+        
+        if file_type == "php":
+            php_files.append(file_config)
+        elif file_type != "changelog":
+            continue
+        elif not needs_description:
+            print(f"Skipping changelog update for {file_path} as needs_description is set to false")
+            continue
+        files_by_path.setdefault(file_path, []).append(file_config)
     
+    # The first PHP file holds the current version
+    main_php_file = php_files[0].get("path") if php_files else None
     if not main_php_file:
         print("No PHP file specified in config")
         sys.exit(1)
@@ -212,23 +430,14 @@ def main():
         changelog_entry = pr_changes
     else:
         print("No checklist items found, using PR title")
-        clean_title = re.sub(r'\[release\]', '', pr_title, flags=re.IGNORECASE).strip()
         changelog_entry = f"- {clean_title}"
     
-    # Update version in files
-    for file_config in config.get("files", []):
-        file_path = file_config.get("path")
-        file_type = file_config.get("type")
-        needs_description = file_config.get("needs_description", True)  # Default to True for backwards compatibility
-        
-        if file_type == "php":
-            patterns = file_config.get("patterns", [])
-            update_version_in_file(file_path, patterns, new_version)
-        elif file_type == "changelog" and needs_description:
-            header_pattern = file_config.get("header_pattern", "")
-            update_changelog(file_path, header_pattern, changelog_entry, new_version)
-        elif file_type == "changelog" and not needs_description:
-            print(f"Skipping changelog update for {file_path} as needs_description is set to false")
+    # Use the same release date for every changelog updated in this run
+    today = datetime.date.today().isoformat()
+    
+    # Update files, one read and at most one write per path
+    for file_path, file_configs in files_by_path.items():
+        _update_file(file_path, file_configs, new_version, changelog_entry, today)
     
     print("Version update completed successfully")
 